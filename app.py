@@ -2,15 +2,41 @@ from flask import Flask, render_template, request, redirect, url_for, flash, jso
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, inspect
+import click
+from collections import Counter
 from datetime import datetime, timedelta
+import json
 import os
+import threading
 import uuid
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///guest_faculty.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///guest_faculty.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Retention: rows older than 'days' (and in one of 'statuses', if given) are moved
+# out of the hot tables into ArchivedRecord by `flask --app app archive-cold-rows`
+app.config['RETENTION_BATCH_SIZE'] = 500
+app.config['CHAT_HISTORY_PAGE_SIZE'] = 50  # Archived messages per "Load earlier messages" page
+app.config['RETENTION_POLICIES'] = {
+    'chat_message': {'days': 180},
+    'online_class': {'days': 90, 'statuses': ['Completed', 'Cancelled']},
+    'requirement': {'days': 90, 'statuses': ['Closed', 'Filled']},
+    'student_request': {'days': 90, 'statuses': ['Closed', 'Filled']},
+    'notification': {'days': 60},
+}
+
+# Notifications: writes enqueue OutboxEvents, `flask --app app process-notifications`
+# fans them out into per-user inboxes and hands them to the delivery backend
+app.config['NOTIFICATION_BATCH_SIZE'] = 100
+app.config['NOTIFICATION_MAX_ATTEMPTS'] = 5
+app.config['NOTIFICATION_CLAIM_TIMEOUT'] = 600  # Seconds before an unfinished claim is retried
+app.config['NOTIFICATION_EVENT_RETENTION_DAYS'] = 7  # Done/Failed events are purged after this
+app.config['NOTIFICATION_BACKEND'] = 'file'  # 'file' or 'console'
+app.config['NOTIFICATION_MAIL_FILE'] = 'outgoing_mail.log'  # Relative to the instance folder
+
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
@@ -82,12 +108,14 @@ class Requirement(db.Model):
     salary_range = db.Column(db.String(100))
     employment_type = db.Column(db.String(50))  # 'Full-time', 'Part-time', 'Visiting'
     posted_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='Open')  # 'Open', 'Closed', 'Filled'
+    # active_history keeps the previous status available to update_rollups()
+    status = db.column_property(db.Column(db.String(20), default='Open'), active_history=True)  # 'Open', 'Closed', 'Filled'
 
 class StudentRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('student_profile.id'), nullable=False)
-    subject = db.Column(db.String(100), nullable=False)
+    # active_history keeps the previous subject available to update_rollups()
+    subject = db.column_property(db.Column(db.String(100), nullable=False), active_history=True)
     description = db.Column(db.Text)
     urgency = db.Column(db.String(20))  # 'High', 'Medium', 'Low'
     posted_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -97,9 +125,10 @@ class ConnectionRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     college_id = db.Column(db.Integer, db.ForeignKey('college_profile.id'), nullable=False)
     faculty_id = db.Column(db.Integer, db.ForeignKey('faculty_profile.id'), nullable=False)
-    status = db.Column(db.String(20), default='Pending')  # 'Pending', 'Accepted', 'Rejected'
+    status = db.column_property(db.Column(db.String(20), default='Pending'), active_history=True)  # 'Pending', 'Accepted', 'Rejected'
     message = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    responded_at = db.Column(db.DateTime)
     
     # Relationships
     college = db.relationship('CollegeProfile', backref='sent_requests')
@@ -125,12 +154,140 @@ class OnlineClass(db.Model):
     duration_minutes = db.Column(db.Integer, default=60)
     meeting_link = db.Column(db.String(200), nullable=False)
     secure_token = db.Column(db.String(100), unique=True, nullable=False)
-    status = db.Column(db.String(20), default='Scheduled')  # 'Scheduled', 'Completed', 'Cancelled'
+    status = db.column_property(db.Column(db.String(20), default='Scheduled'), active_history=True)  # 'Scheduled', 'Completed', 'Cancelled'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     college = db.relationship('CollegeProfile', backref='scheduled_classes')
     faculty = db.relationship('FacultyProfile', backref='assigned_classes')
 
+# Analytics rollups, kept up to date by update_rollups() and rebuilt by `flask --app app rebuild-rollups`
+class CollegeStats(db.Model):
+    college_id = db.Column(db.Integer, db.ForeignKey('college_profile.id'), primary_key=True)
+    open_requirements = db.Column(db.Integer, default=0)
+    filled_requirements = db.Column(db.Integer, default=0)
+    closed_requirements = db.Column(db.Integer, default=0)
+    requests_sent = db.Column(db.Integer, default=0)
+    requests_accepted = db.Column(db.Integer, default=0)
+    requests_rejected = db.Column(db.Integer, default=0)
+    response_seconds_total = db.Column(db.Float, default=0)  # Sum over answered requests
+
+    @property
+    def response_rate(self):
+        if not self.requests_sent:
+            return None
+        return (self.requests_accepted + self.requests_rejected) / self.requests_sent
+
+    @property
+    def avg_response_hours(self):
+        answered = self.requests_accepted + self.requests_rejected
+        if not answered:
+            return None
+        return self.response_seconds_total / answered / 3600
+
+class FacultyMonthlyStats(db.Model):
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculty_profile.id'), primary_key=True)
+    month = db.Column(db.String(7), primary_key=True)  # 'YYYY-MM'
+    classes_scheduled = db.Column(db.Integer, default=0)  # Any status except Cancelled, including future classes
+
+class SubjectDemand(db.Model):
+    subject = db.Column(db.String(100), primary_key=True)  # Lowercased and trimmed
+    month = db.Column(db.String(7), primary_key=True)
+    request_count = db.Column(db.Integer, default=0)
+
+class OutboxEvent(db.Model):
+    # Written in the same transaction as the object it describes
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)  # See NOTIFICATION_EVENTS
+    object_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='Pending', index=True)  # 'Pending', 'Processing', 'Done', 'Failed'
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    processed_at = db.Column(db.DateTime)
+
+class Notification(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('outbox_event.id'))
+    message = db.Column(db.String(300), nullable=False)
+    link = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_read = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        db.Index('ix_notification_inbox', 'user_id', 'is_read', 'created_at'),
+    )
+
+class ArchivedRecord(db.Model):
+    # Cold rows moved out of the hot tables; payload holds the original columns as JSON
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    owner_a = db.Column(db.Integer)  # Lookup keys, see RETENTION_MODELS
+    owner_b = db.Column(db.Integer)
+    recorded_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    payload = db.Column(db.Text, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_archived_lookup', 'table_name', 'owner_a', 'owner_b', 'recorded_at'),
+    )
+
+    def to_row(self):
+        """Rebuild a detached instance of the original model for read-only display."""
+        model = RETENTION_MODELS[self.table_name]['model']
+        values = json.loads(self.payload)
+        for column in model.__table__.columns:
+            if isinstance(column.type, db.DateTime) and values.get(column.name):
+                values[column.name] = datetime.fromisoformat(values[column.name])
+        return model(**values)
+
+# Per-table retention settings: the age column and how to derive the lookup keys
+RETENTION_MODELS = {
+    'chat_message': {
+        'model': ChatMessage,
+        'age_column': 'timestamp',
+        # Order the pair so both directions of a conversation share one index range
+        'owners': lambda m: (min(m.sender_id, m.receiver_id), max(m.sender_id, m.receiver_id)),
+    },
+    'online_class': {
+        'model': OnlineClass,
+        'age_column': 'schedule_time',
+        'owners': lambda c: (c.college_id, c.faculty_id),
+    },
+    'requirement': {
+        'model': Requirement,
+        'age_column': 'posted_at',
+        'owners': lambda r: (r.college_id, None),
+    },
+    'student_request': {
+        'model': StudentRequest,
+        'age_column': 'posted_at',
+        'owners': lambda r: (r.student_id, None),
+    },
+    'notification': {
+        'model': Notification,
+        'age_column': 'created_at',
+        'owners': lambda n: (n.user_id, None),
+    },
+}
+
+# Fields that make up a complete profile, per profile model
+PROFILE_FIELDS = {
+    FacultyProfile: ['full_name', 'phone', 'qualification', 'experience_years', 'subjects',
+                     'specialization', 'location', 'availability', 'bio', 'linkedin_url'],
+    CollegeProfile: ['college_name', 'contact_person', 'phone', 'address', 'city', 'state',
+                     'affiliation', 'website'],
+    StudentProfile: ['full_name', 'phone', 'college_name', 'course', 'semester', 'city'],
+}
+
+def profile_completeness(profile):
+    """Percentage of PROFILE_FIELDS filled in on profile."""
+    fields = PROFILE_FIELDS[type(profile)]
+    filled = sum(1 for field in fields if getattr(profile, field) not in (None, ''))
+    return round(100 * filled / len(fields))
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -226,7 +383,13 @@ def faculty_dashboard():
     
     profile = current_user.faculty_profile
     requirements = Requirement.query.filter_by(status='Open').order_by(Requirement.posted_at.desc()).all()
-    return render_template('faculty_dashboard.html', profile=profile, requirements=requirements)
+    monthly_classes = FacultyMonthlyStats.query.filter_by(faculty_id=profile.id).order_by(
+        FacultyMonthlyStats.month.desc()).limit(6).all()
+    top_subjects = SubjectDemand.query.filter_by(month=_month_key(datetime.utcnow())).order_by(
+        SubjectDemand.request_count.desc()).limit(5).all()
+    return render_template('faculty_dashboard.html', profile=profile, requirements=requirements,
+                           monthly_classes=monthly_classes, top_subjects=top_subjects,
+                           completeness=profile_completeness(profile))
 
 @app.route('/faculty/profile', methods=['GET', 'POST'])
 @login_required
@@ -265,7 +428,11 @@ def college_dashboard():
     
     profile = current_user.college_profile
     requirements = Requirement.query.filter_by(college_id=profile.id).order_by(Requirement.posted_at.desc()).all()
-    return render_template('college_dashboard.html', profile=profile, requirements=requirements)
+    stats = db.session.get(CollegeStats, profile.id) or CollegeStats(
+        college_id=profile.id, open_requirements=0, filled_requirements=0, closed_requirements=0,
+        requests_sent=0, requests_accepted=0, requests_rejected=0, response_seconds_total=0)
+    return render_template('college_dashboard.html', profile=profile, requirements=requirements, stats=stats,
+                           completeness=profile_completeness(profile))
 
 @app.route('/college/profile', methods=['GET', 'POST'])
 @login_required
@@ -344,6 +511,8 @@ def post_requirement():
             employment_type=request.form.get('employment_type')
         )
         db.session.add(requirement)
+        db.session.flush()
+        enqueue_event('requirement_posted', requirement.id)
         db.session.commit()
         flash('Requirement posted successfully!', 'success')
         return redirect(url_for('college_dashboard'))
@@ -420,6 +589,8 @@ def post_student_request():
             urgency=request.form.get('urgency')
         )
         db.session.add(student_request)
+        db.session.flush()
+        enqueue_event('student_request_posted', student_request.id)
         db.session.commit()
         flash('Request posted successfully!', 'success')
         return redirect(url_for('student_dashboard'))
@@ -457,6 +628,8 @@ def send_connection_request(faculty_id):
             message=request.form.get('message', 'I am interested in your profile.')
         )
         db.session.add(new_request)
+        db.session.flush()
+        enqueue_event('connection_requested', new_request.id)
         db.session.commit()
         flash('Request sent successfully!', 'success')
     
@@ -484,6 +657,10 @@ def respond_request(request_id, action):
     if req.faculty_id != current_user.faculty_profile.id:
         flash('Unauthorized!', 'error')
         return redirect(url_for('dashboard'))
+
+    if req.status != 'Pending':
+        flash('You have already responded to this request.', 'info')
+        return redirect(url_for('view_faculty_requests'))
     
     if action == 'accept':
         req.status = 'Accepted'
@@ -491,6 +668,8 @@ def respond_request(request_id, action):
     elif action == 'reject':
         req.status = 'Rejected'
         flash('Request rejected.', 'info')
+    if req.responded_at is None and req.status != 'Pending':
+        req.responded_at = datetime.utcnow()
     
     db.session.commit()
     return redirect(url_for('view_faculty_requests'))
@@ -532,12 +711,51 @@ def chat(other_user_id):
             db.session.commit()
             return redirect(url_for('chat', other_user_id=other_user_id))
 
+    # Older messages live in the archive and are paged in on request, newest first
+    archive_query = ArchivedRecord.query.filter_by(
+        table_name='chat_message',
+        owner_a=min(current_user.id, other_user_id),
+        owner_b=max(current_user.id, other_user_id)
+    )
+    before = request.args.get('before')
+    if before:
+        try:
+            before_time = datetime.fromisoformat(before)
+        except ValueError:
+            return redirect(url_for('chat', other_user_id=other_user_id))
+        before_id = request.args.get('before_id', type=int)
+        if before_id:
+            archive_query = archive_query.filter(
+                (ArchivedRecord.recorded_at < before_time) |
+                ((ArchivedRecord.recorded_at == before_time) & (ArchivedRecord.id < before_id))
+            )
+        else:
+            # First page below the hot window, which holds no archived rows
+            archive_query = archive_query.filter(ArchivedRecord.recorded_at <= before_time)
+        page_size = app.config['CHAT_HISTORY_PAGE_SIZE']
+        archived = archive_query.order_by(
+            ArchivedRecord.recorded_at.desc(), ArchivedRecord.id.desc()
+        ).limit(page_size + 1).all()
+        history_cursor = None
+        if len(archived) > page_size:
+            archived = archived[:page_size]
+            history_cursor = {'before': archived[-1].recorded_at.isoformat(), 'before_id': archived[-1].id}
+        messages = [record.to_row() for record in reversed(archived)]
+        return render_template('chat.html', other_user=other_user, messages=messages,
+                               history_cursor=history_cursor, viewing_history=True)
+
     messages = ChatMessage.query.filter(
         ((ChatMessage.sender_id == current_user.id) & (ChatMessage.receiver_id == other_user_id)) |
         ((ChatMessage.sender_id == other_user_id) & (ChatMessage.receiver_id == current_user.id))
     ).order_by(ChatMessage.timestamp.asc()).all()
+
+    history_cursor = None
+    if archive_query.first() is not None:
+        oldest = messages[0].timestamp if messages else datetime.utcnow()
+        history_cursor = {'before': oldest.isoformat()}
     
-    return render_template('chat.html', other_user=other_user, messages=messages)
+    return render_template('chat.html', other_user=other_user, messages=messages,
+                           history_cursor=history_cursor, viewing_history=False)
 
 @app.route('/messages')
 @login_required
@@ -605,6 +823,8 @@ def schedule_class(faculty_id):
             secure_token=token
         )
         db.session.add(new_class)
+        db.session.flush()
+        enqueue_event('class_scheduled', new_class.id)
         db.session.commit()
         
         flash('Online class scheduled successfully!', 'success')
@@ -666,13 +886,488 @@ def join_class(token):
         
     return render_template('class_room.html', online_class=online_class)
 
+@app.route('/notifications')
+@login_required
+def view_notifications():
+    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).limit(50).all()
+    unread_ids = [n.id for n in notifications if not n.is_read]
+    if unread_ids:
+        Notification.query.filter(Notification.id.in_(unread_ids)).update({'is_read': True}, synchronize_session=False)
+        db.session.commit()
+    return render_template('notifications.html', notifications=notifications, unread_ids=unread_ids)
+
+@app.context_processor
+def inject_unread_notifications():
+    if current_user.is_authenticated:
+        count = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
+        return {'unread_notifications': count}
+    return {'unread_notifications': 0}
+
 # Browse all student requests
 @app.route('/student-requests')
 def browse_student_requests():
     requests = StudentRequest.query.filter_by(status='Open').order_by(StudentRequest.posted_at.desc()).all()
     return render_template('browse_student_requests.html', requests=requests)
 
+# Notifications
+def enqueue_event(event_type, object_id):
+    """Add an OutboxEvent to the current session; the caller commits it with its own write."""
+    db.session.add(OutboxEvent(event_type=event_type, object_id=object_id))
+
+def _faculty_users_for_subject(subject):
+    return db.session.query(FacultyProfile.user_id).filter(
+        FacultyProfile.full_name != '',
+        FacultyProfile.subjects.contains(subject)
+    )
+
+def _requirement_recipients(requirement_id):
+    requirement = db.session.get(Requirement, requirement_id)
+    if not requirement:
+        return [], None, None
+    message = f"New {requirement.subject} requirement posted by {requirement.college.college_name}"
+    return _faculty_users_for_subject(requirement.subject), message, url_for('browse_requirements')
+
+def _student_request_recipients(request_id):
+    student_request = db.session.get(StudentRequest, request_id)
+    if not student_request:
+        return [], None, None
+    message = f"A student is looking for {student_request.subject} faculty"
+    return _faculty_users_for_subject(student_request.subject), message, url_for('browse_student_requests')
+
+def _connection_request_recipients(request_id):
+    req = db.session.get(ConnectionRequest, request_id)
+    if not req:
+        return [], None, None
+    message = f"{req.college.college_name} sent you a connection request"
+    return [(req.faculty.user_id,)], message, url_for('view_faculty_requests')
+
+def _class_recipients(class_id):
+    online_class = db.session.get(OnlineClass, class_id)
+    if not online_class:
+        return [], None, None
+    message = (f"{online_class.subject} class scheduled by {online_class.college.college_name} "
+               f"on {online_class.schedule_time.strftime('%b %d, %H:%M')}")
+    college_name = (online_class.college.college_name or '').strip().lower()
+    students = db.session.query(StudentProfile.user_id).filter(
+        db.func.lower(db.func.trim(StudentProfile.college_name)) == college_name
+    ) if college_name else []
+    return [(online_class.faculty.user_id,)] + list(students), message, url_for('view_classes')
+
+# event_type -> function returning (recipient user_id rows, message, link)
+NOTIFICATION_EVENTS = {
+    'requirement_posted': _requirement_recipients,
+    'student_request_posted': _student_request_recipients,
+    'connection_requested': _connection_request_recipients,
+    'class_scheduled': _class_recipients,
+}
+
+class ConsoleEmailBackend:
+    """Prints outgoing mail; handy while developing."""
+    def send(self, messages):
+        for email, subject, body in messages:
+            print(f"To: {email}\nSubject: {subject}\n\n{body}\n")
+
+class FileEmailBackend:
+    """Appends outgoing mail to a file in the instance folder as a local stand-in for SMTP."""
+    _lock = threading.Lock()
+
+    def send(self, messages):
+        os.makedirs(app.instance_path, exist_ok=True)
+        path = os.path.join(app.instance_path, app.config['NOTIFICATION_MAIL_FILE'])
+        with self._lock, open(path, 'a', encoding='utf-8') as f:
+            for email, subject, body in messages:
+                f.write(f"To: {email}\nSubject: {subject}\nDate: {datetime.utcnow().isoformat()}\n\n{body}\n\n")
+
+NOTIFICATION_BACKENDS = {
+    'console': ConsoleEmailBackend,
+    'file': FileEmailBackend,
+}
+
+def _release_stale_claims():
+    """Return events left Processing by a worker that died back to the queue."""
+    expired = datetime.utcnow() - timedelta(seconds=app.config['NOTIFICATION_CLAIM_TIMEOUT'])
+    stale = OutboxEvent.query.filter(OutboxEvent.status == 'Processing', OutboxEvent.claimed_at < expired)
+    stale.filter(OutboxEvent.attempts >= app.config['NOTIFICATION_MAX_ATTEMPTS']).update(
+        {'status': 'Failed', 'last_error': 'Claim expired'}, synchronize_session=False)
+    stale.filter(OutboxEvent.attempts < app.config['NOTIFICATION_MAX_ATTEMPTS']).update(
+        {'status': 'Pending', 'claimed_at': None}, synchronize_session=False)
+
+def _claim_events(limit):
+    """Mark up to limit pending events as Processing and return their ids."""
+    _release_stale_claims()
+    claimed = []
+    candidates = db.session.query(OutboxEvent.id).filter_by(status='Pending').order_by(OutboxEvent.id).limit(limit).all()
+    for (event_id,) in candidates:
+        # Conditional update so two workers never pick up the same event
+        updated = OutboxEvent.query.filter_by(id=event_id, status='Pending').update(
+            {'status': 'Processing', 'attempts': OutboxEvent.attempts + 1, 'claimed_at': datetime.utcnow()},
+            synchronize_session=False)
+        if updated:
+            claimed.append(event_id)
+    db.session.commit()
+    return claimed
+
+def _deliver_event(event, backend):
+    user_rows, message, link = NOTIFICATION_EVENTS[event.event_type](event.object_id)
+    user_ids = {row[0] for row in user_rows}
+    if user_ids:
+        now = datetime.utcnow()
+        db.session.execute(db.insert(Notification), [
+            {'user_id': user_id, 'event_id': event.id, 'message': message, 'link': link,
+             'created_at': now, 'is_read': False}
+            for user_id in user_ids
+        ])
+        emails = db.session.query(User.email).filter(User.id.in_(user_ids)).all()
+        backend.send([(email, 'Guest Faculty notification', message) for (email,) in emails])
+    event.status = 'Done'
+    event.processed_at = datetime.utcnow()
+
+def process_outbox(batch_size=None):
+    """Fan out one batch of pending events. Returns the number of events handled."""
+    batch_size = batch_size or app.config['NOTIFICATION_BATCH_SIZE']
+    backend = NOTIFICATION_BACKENDS[app.config['NOTIFICATION_BACKEND']]()
+    handled = 0
+    for event_id in _claim_events(batch_size):
+        event = db.session.get(OutboxEvent, event_id)
+        try:
+            _deliver_event(event, backend)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            event = db.session.get(OutboxEvent, event_id)
+            failed = event.attempts >= app.config['NOTIFICATION_MAX_ATTEMPTS']
+            event.status = 'Failed' if failed else 'Pending'
+            event.last_error = str(e)
+            db.session.commit()
+        handled += 1
+    return handled
+
+def purge_processed_events(now=None):
+    """Delete Done and Failed outbox events older than NOTIFICATION_EVENT_RETENTION_DAYS.
+
+    Notifications keep their text and link; only their event_id reference is cleared.
+    Returns the number of events deleted.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=app.config['NOTIFICATION_EVENT_RETENTION_DAYS'])
+    query = db.session.query(OutboxEvent.id).filter(
+        OutboxEvent.status.in_(['Done', 'Failed']), OutboxEvent.created_at < cutoff)
+    total = 0
+    while True:
+        ids = [event_id for (event_id,) in query.order_by(OutboxEvent.id).limit(app.config['NOTIFICATION_BATCH_SIZE'])]
+        if not ids:
+            break
+        Notification.query.filter(Notification.event_id.in_(ids)).update({'event_id': None}, synchronize_session=False)
+        OutboxEvent.query.filter(OutboxEvent.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        total += len(ids)
+    return total
+
+def _notification_worker():
+    # url_for in the recipient builders needs a request context outside of a request
+    with app.app_context(), app.test_request_context():
+        while process_outbox():
+            pass
+        db.session.remove()
+
+@app.cli.command('process-notifications')
+@click.option('--workers', default=4, help='Number of worker threads.')
+def process_notifications_command(workers):
+    """Drain the notification outbox with a pool of workers."""
+    threads = [threading.Thread(target=_notification_worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    purged = purge_processed_events()
+    counts = dict(db.session.query(OutboxEvent.status, db.func.count()).filter(
+        OutboxEvent.status.in_(['Pending', 'Processing', 'Failed'])).group_by(OutboxEvent.status).all())
+    click.echo(f"Outbox drained: {counts.get('Pending', 0)} pending retry, "
+          f"{counts.get('Processing', 0)} still claimed, {counts.get('Failed', 0)} failed, "
+          f"{purged} old events purged")
+
+# Analytics rollups
+def _month_key(value):
+    return value.strftime('%Y-%m')
+
+def _subject_key(subject):
+    return (subject or '').strip().lower()[:100]
+
+def _value_change(session, obj, name):
+    """Return (old, new) values of an attribute for an object in this flush; None means absent."""
+    value = getattr(obj, name)
+    if obj in session.new:
+        return None, value
+    history = getattr(inspect(obj).attrs, name).history
+    old = history.deleted[0] if history.deleted else value
+    if obj in session.deleted:
+        return old, None
+    return old, value
+
+def _status_change(session, obj):
+    return _value_change(session, obj, 'status')
+
+def _apply_deltas(connection, model, deltas):
+    """Add counter deltas ({primary key tuple: {column: delta}}) to a rollup table."""
+    table = model.__table__
+    key_columns = [column.name for column in table.primary_key.columns]
+    for key, changes in deltas.items():
+        changes = {column: delta for column, delta in changes.items() if delta}
+        if not changes:
+            continue
+        where = [table.c[name] == value for name, value in zip(key_columns, key)]
+        result = connection.execute(
+            table.update().where(*where).values({column: table.c[column] + delta for column, delta in changes.items()}))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values({**dict(zip(key_columns, key)), **changes}))
+
+REQUIREMENT_STATUS_COLUMNS = {
+    'Open': 'open_requirements',
+    'Filled': 'filled_requirements',
+    'Closed': 'closed_requirements',
+}
+
+@event.listens_for(db.session, 'after_flush')
+def update_rollups(session, flush_context):
+    """Fold the changes in this flush into the rollup tables, in the same transaction."""
+    college = {}
+    faculty = {}
+    demand = {}
+
+    def bump(rollup, key, column, delta):
+        rollup.setdefault(key, Counter())[column] += delta
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Requirement):
+            old, new = _status_change(session, obj)
+            if old == new:
+                continue
+            if old in REQUIREMENT_STATUS_COLUMNS:
+                bump(college, (obj.college_id,), REQUIREMENT_STATUS_COLUMNS[old], -1)
+            if new in REQUIREMENT_STATUS_COLUMNS:
+                bump(college, (obj.college_id,), REQUIREMENT_STATUS_COLUMNS[new], 1)
+        elif isinstance(obj, ConnectionRequest):
+            old, new = _status_change(session, obj)
+            if old is None and new is not None:
+                bump(college, (obj.college_id,), 'requests_sent', 1)
+            elif old is not None and new is None:
+                bump(college, (obj.college_id,), 'requests_sent', -1)
+            if old == new:
+                continue
+            was_answered = old in ('Accepted', 'Rejected')
+            is_answered = new in ('Accepted', 'Rejected')
+            if was_answered:
+                bump(college, (obj.college_id,), 'requests_' + old.lower(), -1)
+            if is_answered:
+                bump(college, (obj.college_id,), 'requests_' + new.lower(), 1)
+            if was_answered != is_answered and obj.responded_at and obj.created_at:
+                bump(college, (obj.college_id,), 'response_seconds_total',
+                     (obj.responded_at - obj.created_at).total_seconds() * (1 if is_answered else -1))
+        elif isinstance(obj, OnlineClass):
+            old, new = _status_change(session, obj)
+            was_scheduled = old is not None and old != 'Cancelled'
+            is_scheduled = new is not None and new != 'Cancelled'
+            if was_scheduled != is_scheduled:
+                bump(faculty, (obj.faculty_id, _month_key(obj.schedule_time)), 'classes_scheduled',
+                     1 if is_scheduled else -1)
+        elif isinstance(obj, StudentRequest):
+            old, new = _value_change(session, obj, 'subject')
+            old_key = _subject_key(old) if old is not None else None
+            new_key = _subject_key(new) if new is not None else None
+            if old_key == new_key:
+                continue
+            month = _month_key(obj.posted_at or datetime.utcnow())
+            if old_key is not None:
+                bump(demand, (old_key, month), 'request_count', -1)
+            if new_key is not None:
+                bump(demand, (new_key, month), 'request_count', 1)
+
+    if college or faculty or demand:
+        connection = session.connection()
+        _apply_deltas(connection, CollegeStats, college)
+        _apply_deltas(connection, FacultyMonthlyStats, faculty)
+        _apply_deltas(connection, SubjectDemand, demand)
+
+def _archived_field(name):
+    return db.func.json_extract(ArchivedRecord.payload, f'$.{name}')
+
+def _month_of(column):
+    return db.func.strftime('%Y-%m', column)
+
+def rebuild_rollups():
+    """Recompute every rollup from the hot tables plus the archive.
+
+    Every source, archived payloads included, is aggregated with GROUP BY in
+    SQLite; only the grouped rows reach Python. The write lock is taken first so
+    no concurrent update_rollups() delta can fall between the reads and the rewrite.
+    """
+    db.session.commit()
+    db.session.execute(db.text('BEGIN IMMEDIATE'))
+
+    college = {}
+    faculty = Counter()
+    demand = Counter()
+
+    def college_row(college_id):
+        return college.setdefault(college_id, Counter())
+
+    archived_requirements = db.session.query(
+        ArchivedRecord.owner_a, _archived_field('status'), db.func.count()
+    ).filter(ArchivedRecord.table_name == 'requirement').group_by(ArchivedRecord.owner_a, _archived_field('status'))
+    hot_requirements = db.session.query(
+        Requirement.college_id, Requirement.status, db.func.count()
+    ).group_by(Requirement.college_id, Requirement.status)
+    for college_id, status, count in list(hot_requirements) + list(archived_requirements):
+        if status in REQUIREMENT_STATUS_COLUMNS:
+            college_row(college_id)[REQUIREMENT_STATUS_COLUMNS[status]] += count
+
+    answered = ConnectionRequest.status.in_(['Accepted', 'Rejected'])
+    latency = (db.func.julianday(ConnectionRequest.responded_at) -
+               db.func.julianday(ConnectionRequest.created_at)) * 86400
+    for college_id, sent, accepted, rejected, seconds in db.session.query(
+            ConnectionRequest.college_id,
+            db.func.count(),
+            db.func.sum(db.case((ConnectionRequest.status == 'Accepted', 1), else_=0)),
+            db.func.sum(db.case((ConnectionRequest.status == 'Rejected', 1), else_=0)),
+            db.func.sum(db.case((answered, latency), else_=0))
+    ).group_by(ConnectionRequest.college_id):
+        row = college_row(college_id)
+        row['requests_sent'] += sent
+        row['requests_accepted'] += accepted
+        row['requests_rejected'] += rejected
+        row['response_seconds_total'] += seconds or 0
+
+    hot_classes = db.session.query(
+        OnlineClass.faculty_id, _month_of(OnlineClass.schedule_time), db.func.count()
+    ).filter(OnlineClass.status != 'Cancelled').group_by(OnlineClass.faculty_id, _month_of(OnlineClass.schedule_time))
+    archived_classes = db.session.query(
+        ArchivedRecord.owner_b, _month_of(ArchivedRecord.recorded_at), db.func.count()
+    ).filter(
+        ArchivedRecord.table_name == 'online_class', _archived_field('status') != 'Cancelled'
+    ).group_by(ArchivedRecord.owner_b, _month_of(ArchivedRecord.recorded_at))
+    for faculty_id, month, count in list(hot_classes) + list(archived_classes):
+        faculty[(faculty_id, month)] += count
+
+    # Grouped on the raw subject; the handful of resulting rows are normalized here
+    hot_demand = db.session.query(
+        StudentRequest.subject, _month_of(StudentRequest.posted_at), db.func.count()
+    ).group_by(StudentRequest.subject, _month_of(StudentRequest.posted_at))
+    archived_demand = db.session.query(
+        _archived_field('subject'), _month_of(ArchivedRecord.recorded_at), db.func.count()
+    ).filter(ArchivedRecord.table_name == 'student_request').group_by(
+        _archived_field('subject'), _month_of(ArchivedRecord.recorded_at))
+    for subject, month, count in list(hot_demand) + list(archived_demand):
+        demand[(_subject_key(subject), month)] += count
+
+    college_columns = ['open_requirements', 'filled_requirements', 'closed_requirements', 'requests_sent',
+                       'requests_accepted', 'requests_rejected', 'response_seconds_total']
+    for model in (CollegeStats, FacultyMonthlyStats, SubjectDemand):
+        db.session.execute(model.__table__.delete())
+    if college:
+        db.session.execute(CollegeStats.__table__.insert(), [
+            dict({column: row[column] for column in college_columns}, college_id=college_id)
+            for college_id, row in college.items()
+        ])
+    if faculty:
+        db.session.execute(FacultyMonthlyStats.__table__.insert(), [
+            {'faculty_id': faculty_id, 'month': month, 'classes_scheduled': count}
+            for (faculty_id, month), count in faculty.items()
+        ])
+    if demand:
+        db.session.execute(SubjectDemand.__table__.insert(), [
+            {'subject': subject, 'month': month, 'request_count': count}
+            for (subject, month), count in demand.items()
+        ])
+    db.session.commit()
+    return len(college), len(faculty), len(demand)
+
+def rollups_need_backfill():
+    """True when the rollup tables are empty but there is data to aggregate, e.g. right after an upgrade."""
+    for model in (CollegeStats, FacultyMonthlyStats, SubjectDemand):
+        if db.session.query(model).first() is not None:
+            return False
+    return any(db.session.query(model.id).first() is not None
+               for model in (Requirement, ConnectionRequest, OnlineClass, StudentRequest, ArchivedRecord))
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Backfill the analytics rollup tables from scratch."""
+    colleges, faculty_months, subject_months = rebuild_rollups()
+    click.echo(f"Rebuilt stats for {colleges} colleges, {faculty_months} faculty-months, {subject_months} subject-months")
+
+# Retention
+def _serialize_row(row):
+    values = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.name)
+        values[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    return json.dumps(values)
+
+def archive_cold_rows(table_name, batch_size=None, now=None):
+    """Move rows matching the table's retention policy into ArchivedRecord.
+
+    Works in chunks of batch_size, committing after each one so a long run never
+    holds a write lock for long. Returns the number of rows archived.
+    """
+    policy = app.config['RETENTION_POLICIES'].get(table_name)
+    if not policy:
+        return 0
+    spec = RETENTION_MODELS[table_name]
+    model = spec['model']
+    age_column = getattr(model, spec['age_column'])
+    batch_size = batch_size or app.config['RETENTION_BATCH_SIZE']
+    cutoff = (now or datetime.utcnow()) - timedelta(days=policy['days'])
+
+    query = model.query.filter(age_column < cutoff)
+    if policy.get('statuses'):
+        query = query.filter(model.status.in_(policy['statuses']))
+
+    total = 0
+    while True:
+        rows = query.order_by(model.id).limit(batch_size).all()
+        if not rows:
+            break
+        for row in rows:
+            owner_a, owner_b = spec['owners'](row)
+            db.session.add(ArchivedRecord(
+                table_name=table_name,
+                record_id=row.id,
+                owner_a=owner_a,
+                owner_b=owner_b,
+                recorded_at=getattr(row, spec['age_column']),
+                payload=_serialize_row(row)
+            ))
+        ids = [row.id for row in rows]
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.expunge_all()
+        total += len(rows)
+    return total
+
+@app.cli.command('archive-cold-rows')
+def archive_cold_rows_command():
+    """Apply RETENTION_POLICIES to every hot table."""
+    for table_name in app.config['RETENTION_POLICIES']:
+        count = archive_cold_rows(table_name)
+        click.echo(f"{table_name}: archived {count} rows")
+
+# Schema upgrades: db.create_all() never alters a table that already exists, so
+# columns added to existing tables are patched in here
+SCHEMA_UPGRADES = [
+    ('connection_request', 'responded_at', 'DATETIME'),
+    ('outbox_event', 'claimed_at', 'DATETIME'),
+]
+
+def upgrade_schema():
+    for table_name, column_name, column_type in SCHEMA_UPGRADES:
+        columns = {row[1] for row in db.session.execute(db.text(f'PRAGMA table_info({table_name})'))}
+        if columns and column_name not in columns:
+            db.session.execute(db.text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}'))
+    db.session.commit()
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+        if rollups_need_backfill():
+            rebuild_rollups()
     app.run(debug=True, port=5000)
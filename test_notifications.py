@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# The app binds its database on import, so point it at a throwaway file first
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+
+from werkzeug.security import generate_password_hash
+
+from app import (app, db, User, FacultyProfile, CollegeProfile, StudentProfile, Requirement, OutboxEvent,
+                 Notification, NOTIFICATION_BACKENDS, enqueue_event, process_outbox, purge_processed_events,
+                 _claim_events)
+
+
+class RecordingBackend:
+    sent = []
+
+    def send(self, messages):
+        RecordingBackend.sent.extend(messages)
+
+
+class FailingBackend:
+    def send(self, messages):
+        raise RuntimeError('mail server down')
+
+
+class NotificationPipelineTest(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        NOTIFICATION_BACKENDS['recording'] = RecordingBackend
+        NOTIFICATION_BACKENDS['failing'] = FailingBackend
+        app.config['NOTIFICATION_BACKEND'] = 'recording'
+        RecordingBackend.sent = []
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            users = [('college@x.org', 'college'), ('math@x.org', 'faculty'), ('chem@x.org', 'faculty'),
+                     ('s1@x.org', 'student'), ('s2@x.org', 'student'), ('other@x.org', 'student')]
+            for email, user_type in users:
+                db.session.add(User(email=email, password_hash=generate_password_hash('pw'), user_type=user_type))
+            db.session.commit()
+            db.session.add_all([
+                CollegeProfile(user_id=1, college_name='Test College'),
+                FacultyProfile(user_id=2, full_name='Math Faculty', subjects='Math, Applied Math'),
+                FacultyProfile(user_id=3, full_name='Chem Faculty', subjects='Chemistry'),
+                StudentProfile(user_id=4, full_name='S1', college_name='Test College'),
+                StudentProfile(user_id=5, full_name='S2', college_name=' test college '),
+                StudentProfile(user_id=6, full_name='Other', college_name='Elsewhere'),
+            ])
+            db.session.commit()
+
+    def tearDown(self):
+        app.config['NOTIFICATION_BACKEND'] = 'file'
+        del NOTIFICATION_BACKENDS['recording']
+        del NOTIFICATION_BACKENDS['failing']
+
+    def login(self, email, user_type):
+        client = app.test_client()
+        client.post('/login', data={'email': email, 'password': 'pw', 'user_type': user_type})
+        return client
+
+    def drain(self):
+        with app.test_request_context():
+            while process_outbox():
+                pass
+
+    def test_event_is_written_with_the_post(self):
+        college = self.login('college@x.org', 'college')
+        college.post('/college/post-requirement', data={'subject': 'Math', 'description': 'd'})
+        with app.app_context():
+            requirement = Requirement.query.one()
+            event = OutboxEvent.query.one()
+            self.assertEqual((event.event_type, event.object_id, event.status),
+                             ('requirement_posted', requirement.id, 'Pending'))
+
+            # Rolling back the write discards its event too
+            requirement = Requirement(college_id=1, subject='Physics')
+            db.session.add(requirement)
+            db.session.flush()
+            enqueue_event('requirement_posted', requirement.id)
+            db.session.rollback()
+            self.assertEqual(OutboxEvent.query.count(), 1)
+
+    def test_fan_out_reaches_each_recipient_once(self):
+        college = self.login('college@x.org', 'college')
+        college.post('/college/post-requirement', data={'subject': 'Math', 'description': 'd'})
+        college.post('/college/send-request/1', data={'message': 'hi'})
+        self.login('math@x.org', 'faculty').get('/faculty/respond-request/1/accept')
+        college.post('/college/schedule-class/1',
+                     data={'subject': 'Math', 'date': '2026-11-02', 'time': '10:00', 'duration': '60'})
+        self.drain()
+        self.drain()
+
+        with app.app_context():
+            self.assertEqual({e.status for e in OutboxEvent.query}, {'Done'})
+            by_event = {}
+            for n in Notification.query:
+                by_event.setdefault(db.session.get(OutboxEvent, n.event_id).event_type, []).append(n.user_id)
+        self.assertEqual(by_event['requirement_posted'], [2])
+        self.assertEqual(by_event['connection_requested'], [2])
+        self.assertEqual(sorted(by_event['class_scheduled']), [2, 4, 5])
+        self.assertEqual(len(RecordingBackend.sent), 5)
+
+    def test_failing_backend_retries_then_fails(self):
+        app.config['NOTIFICATION_BACKEND'] = 'failing'
+        self.login('college@x.org', 'college').post('/college/post-requirement',
+                                                    data={'subject': 'Math', 'description': 'd'})
+        max_attempts = app.config['NOTIFICATION_MAX_ATTEMPTS']
+        with app.test_request_context():
+            for attempt in range(1, max_attempts + 1):
+                self.assertEqual(process_outbox(), 1)
+                event = OutboxEvent.query.one()
+                self.assertEqual(event.attempts, attempt)
+                self.assertEqual(event.status, 'Failed' if attempt == max_attempts else 'Pending')
+            self.assertEqual(process_outbox(), 0)
+            self.assertIn('mail server down', event.last_error)
+            # Inbox rows from the failed attempts were rolled back
+            self.assertEqual(Notification.query.count(), 0)
+
+    def test_claims_are_exclusive_and_expire(self):
+        expired = datetime.utcnow() - timedelta(seconds=app.config['NOTIFICATION_CLAIM_TIMEOUT'] + 60)
+        with app.app_context():
+            db.session.add_all([
+                OutboxEvent(event_type='requirement_posted', object_id=1),
+                OutboxEvent(event_type='requirement_posted', object_id=2, status='Processing',
+                            attempts=1, claimed_at=expired),
+                OutboxEvent(event_type='requirement_posted', object_id=3, status='Processing',
+                            attempts=app.config['NOTIFICATION_MAX_ATTEMPTS'], claimed_at=expired),
+                OutboxEvent(event_type='requirement_posted', object_id=4, status='Processing',
+                            attempts=1, claimed_at=datetime.utcnow()),
+            ])
+            db.session.commit()
+
+            self.assertEqual(_claim_events(10), [1, 2])
+            self.assertEqual(_claim_events(10), [])
+            statuses = {e.object_id: (e.status, e.attempts) for e in OutboxEvent.query}
+        self.assertEqual(statuses, {1: ('Processing', 1), 2: ('Processing', 2),
+                                    3: ('Failed', app.config['NOTIFICATION_MAX_ATTEMPTS']),
+                                    4: ('Processing', 1)})
+
+    def test_purge_keeps_notifications(self):
+        self.login('college@x.org', 'college').post('/college/post-requirement',
+                                                    data={'subject': 'Math', 'description': 'd'})
+        self.drain()
+        with app.app_context():
+            self.assertEqual(purge_processed_events(), 0)
+            later = datetime.utcnow() + timedelta(days=app.config['NOTIFICATION_EVENT_RETENTION_DAYS'] + 1)
+            self.assertEqual(purge_processed_events(now=later), 1)
+            self.assertEqual(OutboxEvent.query.count(), 0)
+            self.assertEqual([n.event_id for n in Notification.query], [None])
+
+
+if __name__ == '__main__':
+    unittest.main()
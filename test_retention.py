@@ -0,0 +1,107 @@
+import os
+import re
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# The app binds its database on import, so point it at a throwaway file first
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+
+from werkzeug.security import generate_password_hash
+
+from app import (app, db, User, FacultyProfile, CollegeProfile, Requirement, ConnectionRequest, ChatMessage,
+                 ArchivedRecord, archive_cold_rows)
+
+
+class RetentionTest(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['CHAT_HISTORY_PAGE_SIZE'] = 3
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            for email, user_type in [('college@x.org', 'college'), ('faculty@x.org', 'faculty')]:
+                db.session.add(User(email=email, password_hash=generate_password_hash('pw'), user_type=user_type))
+            db.session.commit()
+            db.session.add_all([
+                CollegeProfile(user_id=1, college_name='Test College'),
+                FacultyProfile(user_id=2, full_name='Test Faculty'),
+            ])
+            db.session.commit()
+            db.session.add(ConnectionRequest(college_id=1, faculty_id=1, status='Accepted'))
+            db.session.commit()
+
+    def tearDown(self):
+        app.config['CHAT_HISTORY_PAGE_SIZE'] = 50
+
+    def add_messages(self, count, when):
+        # Pairs share a timestamp so page boundaries fall on ties
+        for i in range(count):
+            sender, receiver = (1, 2) if i % 2 else (2, 1)
+            db.session.add(ChatMessage(sender_id=sender, receiver_id=receiver, content=f'msg{i}',
+                                       timestamp=when + timedelta(seconds=i // 2)))
+        db.session.commit()
+
+    def login(self):
+        client = app.test_client()
+        client.post('/login', data={'email': 'college@x.org', 'password': 'pw', 'user_type': 'college'})
+        return client
+
+    def page(self, client, url):
+        html = client.get(url).get_data(as_text=True)
+        shown = [int(n) for n in re.findall(r'>msg(\d+)<', html)]
+        link = re.search(r'href="([^"]*before=[^"]*)"', html)
+        return shown, link.group(1).replace('&amp;', '&') if link else None
+
+    def test_archive_runs_in_batches_and_respects_policy(self):
+        old = datetime.utcnow() - timedelta(days=400)
+        with app.app_context():
+            self.add_messages(7, old)
+            self.add_messages(1, datetime.utcnow())
+            for status in ['Filled', 'Closed', 'Open']:
+                db.session.add(Requirement(college_id=1, subject='Math', status=status, posted_at=old))
+            db.session.commit()
+
+            self.assertEqual(archive_cold_rows('chat_message', batch_size=3), 7)
+            self.assertEqual(archive_cold_rows('requirement', batch_size=1), 2)
+            self.assertEqual(archive_cold_rows('chat_message', batch_size=3), 0)
+
+            self.assertEqual(ChatMessage.query.count(), 1)
+            self.assertEqual([r.status for r in Requirement.query], ['Open'])
+            archived = ArchivedRecord.query.filter_by(table_name='chat_message').all()
+            self.assertEqual(sorted(r.to_row().content for r in archived), [f'msg{i}' for i in range(7)])
+            self.assertEqual({(r.owner_a, r.owner_b) for r in archived}, {(1, 2)})
+
+    def test_history_pages_newest_first_across_ties(self):
+        with app.app_context():
+            self.add_messages(8, datetime.utcnow() - timedelta(days=400))
+            archive_cold_rows('chat_message', batch_size=3)
+            db.session.add(ChatMessage(sender_id=2, receiver_id=1, content='latest'))
+            db.session.commit()
+
+        client = self.login()
+        shown, url = self.page(client, '/chat/2')
+        self.assertEqual(shown, [])
+        pages = []
+        while url:
+            shown, url = self.page(client, url)
+            pages.append(shown)
+        self.assertEqual(pages, [[5, 6, 7], [2, 3, 4], [0, 1]])
+
+    def test_first_history_page_includes_cursor_timestamp(self):
+        when = datetime.utcnow() - timedelta(days=400)
+        with app.app_context():
+            self.add_messages(1, when)
+            archive_cold_rows('chat_message')
+        shown, url = self.page(self.login(), f'/chat/2?before={when.isoformat()}')
+        self.assertEqual((shown, url), ([0], None))
+
+    def test_bad_cursor_redirects_to_chat(self):
+        response = self.login().get('/chat/2?before=yesterday')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith('/chat/2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# The app binds its database on import, so point it at a throwaway file first
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_db_dir, 'test.db')
+
+from werkzeug.security import generate_password_hash
+
+from app import (app, db, User, FacultyProfile, CollegeProfile, StudentProfile, Requirement,
+                 OnlineClass, StudentRequest, CollegeStats, FacultyMonthlyStats,
+                 SubjectDemand, archive_cold_rows, rebuild_rollups)
+
+
+def snapshot():
+    colleges = sorted(
+        (s.college_id, s.open_requirements, s.filled_requirements, s.closed_requirements, s.requests_sent,
+         s.requests_accepted, s.requests_rejected, round(s.response_seconds_total, 1))
+        for s in CollegeStats.query
+    )
+    faculty = sorted((s.faculty_id, s.month, s.classes_scheduled) for s in FacultyMonthlyStats.query if s.classes_scheduled)
+    demand = sorted((s.subject, s.month, s.request_count) for s in SubjectDemand.query if s.request_count)
+    return colleges, faculty, demand
+
+
+class RollupConsistencyTest(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            for email, user_type in [('college@x.org', 'college'), ('faculty@x.org', 'faculty'),
+                                     ('student@x.org', 'student')]:
+                db.session.add(User(email=email, password_hash=generate_password_hash('pw'), user_type=user_type))
+            db.session.commit()
+            db.session.add_all([
+                CollegeProfile(user_id=1, college_name='Test College'),
+                FacultyProfile(user_id=2, full_name='Test Faculty', subjects='Math, Physics'),
+                StudentProfile(user_id=3, full_name='Test Student'),
+            ])
+            db.session.commit()
+
+    def login(self, email, user_type):
+        client = app.test_client()
+        client.post('/login', data={'email': email, 'password': 'pw', 'user_type': user_type})
+        return client
+
+    def test_incremental_counters_match_rebuild(self):
+        college = self.login('college@x.org', 'college')
+        faculty = self.login('faculty@x.org', 'faculty')
+        student = self.login('student@x.org', 'student')
+
+        for _ in range(4):
+            college.post('/college/post-requirement', data={'subject': 'Math', 'description': 'd'})
+        for subject in ['Math', ' math', 'Physics']:
+            student.post('/student/post-request', data={'subject': subject, 'description': 'd'})
+        college.post('/college/send-request/1', data={'message': 'hi'})
+        faculty.get('/faculty/respond-request/1/accept')
+        # Already answered, so this must not move the counters
+        faculty.get('/faculty/respond-request/1/reject')
+        for day in ['2026-01-05', '2026-01-06', '2026-02-01']:
+            college.post('/college/schedule-class/1',
+                         data={'subject': 'Math', 'date': day, 'time': '10:00', 'duration': '60'})
+
+        with app.app_context():
+            # Status changes on instances expired by an earlier commit
+            first, second, third = Requirement.query.order_by(Requirement.id).limit(3).all()
+            db.session.commit()
+            first.status = 'Filled'
+            second.status = 'Closed'
+            db.session.commit()
+            db.session.delete(third)
+            classes = OnlineClass.query.order_by(OnlineClass.id).all()
+            db.session.commit()
+            classes[0].status = 'Completed'
+            classes[1].status = 'Cancelled'
+            StudentRequest.query.filter_by(subject='Physics').first().status = 'Closed'
+            db.session.commit()
+
+            # Archive everything eligible, then keep changing the hot rows
+            later = datetime.utcnow() + timedelta(days=3650)
+            for table_name in app.config['RETENTION_POLICIES']:
+                archive_cold_rows(table_name, batch_size=2, now=later)
+            Requirement.query.filter_by(status='Open').first().status = 'Filled'
+            renamed = StudentRequest.query.filter_by(subject=' math').first()
+            db.session.commit()
+            renamed.subject = 'Chemistry'
+            db.session.commit()
+
+            incremental = snapshot()
+            rebuild_rollups()
+            rebuilt = snapshot()
+
+        self.assertEqual(incremental, rebuilt)
+        colleges, faculty_months, demand = rebuilt
+        self.assertEqual(colleges, [(1, 0, 2, 1, 1, 1, 0, colleges[0][7])])
+        self.assertEqual(faculty_months, [(1, '2026-01', 1), (1, '2026-02', 1)])
+        month = datetime.utcnow().strftime('%Y-%m')
+        self.assertEqual(demand, [('chemistry', month, 1), ('math', month, 1), ('physics', month, 1)])
+
+    def test_cascaded_student_request_delete(self):
+        student = self.login('student@x.org', 'student')
+        for subject in ['Math', 'Physics']:
+            student.post('/student/post-request', data={'subject': subject, 'description': 'd'})
+
+        with app.app_context():
+            # Deleting the user cascades through StudentProfile to its requests
+            db.session.delete(db.session.get(User, 3))
+            db.session.commit()
+
+            incremental = snapshot()
+            rebuild_rollups()
+            rebuilt = snapshot()
+
+        self.assertEqual(incremental, rebuilt)
+        self.assertEqual(rebuilt[2], [])
+
+
+if __name__ == '__main__':
+    unittest.main()